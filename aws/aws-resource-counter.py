@@ -1,8 +1,17 @@
 import boto3
-from concurrent.futures import ThreadPoolExecutor
+from botocore.client import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
+import argparse
 import csv
+import hashlib
+import json
 import logging
+import os
+import queue
+import threading
+import time
 
 # Configure logging to write to a file
 log_file_name = "aws_resource_count.log"
@@ -11,6 +20,93 @@ logging.basicConfig(filename=log_file_name, level=logging.INFO, format='%(leveln
 # Define the CSV file name
 csv_file_name = "aws_resource_counts.csv"
 
+# Shared client configuration: size the connection pool to the shared worker pools so
+# concurrent calls reuse keep-alive connections, and let botocore back off on throttling
+BOTO_CFG = Config(
+    max_pool_connections=64,
+    retries={'max_attempts': 10, 'mode': 'adaptive'}
+)
+
+# Worker pools shared by every account, so the thread count stays bounded however many accounts
+# run at once. Each level only waits on the level below it, so the pools cannot deadlock:
+# accounts -> regions -> per-service calls -> per-cluster / per-repository calls
+region_executor = ThreadPoolExecutor(max_workers=30)
+service_executor = ThreadPoolExecutor(max_workers=64)
+fanout_executor = ThreadPoolExecutor(max_workers=64)
+
+# Header row of the CSV file
+CSV_HEADER = [
+    'Account ID',
+    'Running EC2 Instances',
+    'Lambda Functions',
+    'ECS Fargate Tasks',
+    'EKS Instances',
+    'ECR Repositories',
+    'ECR Images',
+    'EKS Nodes'
+]
+
+# Resource columns of the CSV file, in the order counts are returned
+RESOURCE_LABELS = CSV_HEADER[1:]
+
+# Services counted in each region
+SERVICES = ['ec2', 'lambda', 'ecs', 'eks', 'ecr']
+
+# Error codes returned when a request is throttled
+THROTTLE_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+}
+
+# Disk cache for account metadata that rarely changes (organization, member accounts, regions)
+cache_file_name = os.path.expanduser("~/.aws-rc-cache.json")
+CACHE_TTL_SECONDS = 24 * 60 * 60
+cache_enabled = True
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cached(key, loader):
+    """
+    Return a value from the disk cache, calling the loader and caching its result on a miss.
+
+    Args:
+        key (str): Cache key.
+        loader (callable): Function returning the value to cache. Exceptions are not cached.
+
+    Returns:
+        object: Cached or freshly loaded JSON-serializable value.
+    """
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            try:
+                with open(cache_file_name) as cache_file:
+                    _cache = json.load(cache_file)
+            except (OSError, ValueError):
+                _cache = {}
+
+        # When the cache is disabled, skip the lookup but still refresh the stored entry
+        entry = _cache.get(key) if cache_enabled else None
+        if entry and time.time() - entry['time'] < CACHE_TTL_SECONDS:
+            return entry['value']
+
+    value = loader()
+
+    with _cache_lock:
+        _cache[key] = {'time': time.time(), 'value': value}
+        try:
+            with open(cache_file_name, 'w') as cache_file:
+                json.dump(_cache, cache_file)
+        except OSError as e:
+            logging.error(f"Error writing cache file {cache_file_name}: {e}")
+
+    return value
+
 def get_management_account_id(management_session):
     """
     Get the AWS account ID of the management account in the organization.
@@ -22,14 +118,21 @@ def get_management_account_id(management_session):
         str: AWS account ID of the management account.
     """
     org_client = management_session.client('organizations')
+
+    # Key the cache on a hash of the access key rather than the key itself
+    access_key = management_session.get_credentials().access_key
+    cache_key = f"organization:{hashlib.sha256(access_key.encode()).hexdigest()}"
+
     try:
-        response = org_client.describe_organization()
-        return response['Organization']['MasterAccountId']
+        return get_cached(
+            cache_key,
+            lambda: org_client.describe_organization()['Organization']['MasterAccountId']
+        )
     except Exception as e:
         logging.error(f"Error getting management account ID: {e}")
         return None
 
-def assume_role_and_get_session(account_id, role_name, session_name, management_session):
+def assume_role_and_get_session(account_id, role_name, session_name, sts_client):
     """
     Assume a role in a member account and return a session.
 
@@ -37,13 +140,12 @@ def assume_role_and_get_session(account_id, role_name, session_name, management_
         account_id (str): AWS account ID.
         role_name (str): Name of the IAM role to assume.
         session_name (str): Name for the assumed session.
-        management_session (boto3.Session): Session for the management account.
+        sts_client (botocore.client.STS): STS client for the management account.
 
     Returns:
         boto3.Session: Session for the assumed role.
         Exception: Error encountered during the role assumption, if any.
     """
-    sts_client = management_session.client('sts')
     role_arn = f'arn:aws:iam::{account_id}:role/{role_name}'
 
     try:
@@ -63,47 +165,163 @@ def assume_role_and_get_session(account_id, role_name, session_name, management_
     except Exception as e:
         return None, e
 
-def count_resources_in_region(account_session, region_name):
+def log_count_error(resource_name, client, error):
+    """
+    Log an error that stopped a resource count in a region.
+
+    Throttling errors are only seen here once botocore has exhausted its retries,
+    so they are reported as an incomplete count.
+
+    Args:
+        resource_name (str): Name of the resources being counted.
+        client (botocore.client.BaseClient): Client the count was made with.
+        error (Exception): Error raised while counting.
+    """
+    region_name = client.meta.region_name
+
+    if isinstance(error, ClientError) and error.response['Error']['Code'] in THROTTLE_CODES:
+        logging.error(f"Throttled while counting {resource_name} in {region_name} after retries, count is incomplete: {error}")
+    else:
+        logging.error(f"Error counting {resource_name} in {region_name}: {error}")
+
+def get_service_regions(management_session):
+    """
+    Get the regions in which each counted service is available.
+
+    Uses the AWS global infrastructure public parameters in Systems Manager,
+    cached on disk for CACHE_TTL_SECONDS.
+
+    Args:
+        management_session (boto3.Session): Session for the management account.
+
+    Returns:
+        dict: Set of region names keyed by service name. Services whose regions
+        could not be retrieved are omitted.
+    """
+    ssm_client = management_session.client('ssm', region_name='us-east-1', config=BOTO_CFG)
+    paginator = ssm_client.get_paginator('get_parameters_by_path')
+    service_regions = {}
+
+    def load_regions(service_name):
+        regions = set()
+        for page in paginator.paginate(Path=f'/aws/service/global-infrastructure/services/{service_name}/regions'):
+            for parameter in page['Parameters']:
+                regions.add(parameter['Value'])
+        return sorted(regions)
+
+    for service_name in SERVICES:
+        try:
+            # The cache stores a sorted list because sets are not JSON-serializable
+            service_regions[service_name] = set(
+                get_cached(f"service_regions:{service_name}", lambda: load_regions(service_name))
+            )
+        except Exception as e:
+            logging.error(f"Error getting available regions for {service_name}: {e}")
+
+    return service_regions
+
+def is_service_available(service_regions, service_name, region_name):
+    """
+    Check whether a service is available in a region.
+
+    Args:
+        service_regions (dict): Set of region names keyed by service name.
+        service_name (str): AWS service name.
+        region_name (str): AWS region name.
+
+    Returns:
+        bool: False only if the service is known to be unavailable in the region.
+    """
+    return service_name not in service_regions or region_name in service_regions[service_name]
+
+def count_resources_in_region(account_session, region_name, service_regions):
     """
     Count resources concurrently in a specific region.
 
     Args:
         account_session (boto3.Session): Session for the AWS account.
         region_name (str): AWS region name.
+        service_regions (dict): Set of region names keyed by service name.
 
     Returns:
-        dict: Resource counts in the region.
+        tuple: Resource counts in the region, in CSV column order.
     """
+    # Keys are kept in CSV column order so the values can be returned positionally
     counts = {
-        'running_ec2_instances': count_running_ec2_instances_in_region(account_session, region_name),
-        'lambda_functions': count_lambda_functions_in_region(account_session, region_name),
-        'ecs_fargate_tasks': count_ecs_fargate_tasks_in_region(account_session, region_name),
-        'eks_instances': count_eks_instances_in_region(account_session, region_name),
-        'ecr_repositories': count_ecr_repositories_in_region(account_session, region_name),
-        'ecr_images': count_ecr_images_in_region(account_session, region_name),
-        'eks_nodes': count_eks_nodes_in_region(account_session, region_name),  # Add EKS node counting
+        'running_ec2_instances': 0,
+        'lambda_functions': 0,
+        'ecs_fargate_tasks': 0,
+        'eks_instances': 0,
+        'ecr_repositories': 0,
+        'ecr_images': 0,
+        'eks_nodes': 0,  # Add EKS node counting
     }
-    return counts
+
+    # Build each service client once per region and issue the per-service calls concurrently,
+    # skipping services that are not offered in the region
+    futures = {}
+
+    if is_service_available(service_regions, 'ec2', region_name):
+        ec2_client = account_session.client('ec2', region_name=region_name, config=BOTO_CFG)
+        futures['running_ec2_instances'] = service_executor.submit(count_running_ec2_instances_in_region, ec2_client)
+
+    if is_service_available(service_regions, 'lambda', region_name):
+        lambda_client = account_session.client('lambda', region_name=region_name, config=BOTO_CFG)
+        futures['lambda_functions'] = service_executor.submit(count_lambda_functions_in_region, lambda_client)
+
+    if is_service_available(service_regions, 'ecs', region_name):
+        ecs_client = account_session.client('ecs', region_name=region_name, config=BOTO_CFG)
+        futures['ecs_fargate_tasks'] = service_executor.submit(count_ecs_fargate_tasks_in_region, ecs_client)
+
+    if is_service_available(service_regions, 'eks', region_name):
+        eks_client = account_session.client('eks', region_name=region_name, config=BOTO_CFG)
+        futures['eks_instances'] = service_executor.submit(count_eks_instances_in_region, eks_client)
+        futures['eks_nodes'] = service_executor.submit(count_eks_nodes_in_region, eks_client)
+
+    if is_service_available(service_regions, 'ecr', region_name):
+        ecr_client = account_session.client('ecr', region_name=region_name, config=BOTO_CFG)
+        ecr_future = service_executor.submit(count_ecr_in_region, ecr_client)
+        counts['ecr_repositories'], counts['ecr_images'] = ecr_future.result()
+
+    for resource_name, future in futures.items():
+        counts[resource_name] = future.result()
+
+    return tuple(counts.values())
+
+def list_eks_cluster_names(eks_client):
+    """
+    List EKS cluster names in a specific region with pagination support.
+
+    Args:
+        eks_client (botocore.client.EKS): EKS client for the region.
+
+    Returns:
+        list: Names of the EKS clusters.
+    """
+    cluster_names = []
+    paginator = eks_client.get_paginator('list_clusters')
+
+    # ListClusters returns only cluster names, 100 per page at most
+    for page in paginator.paginate(PaginationConfig={'PageSize': 100}):
+        cluster_names.extend(page.get('clusters', []))
+
+    return cluster_names
 
 # Add a new function to count EKS nodes in a region
-def count_eks_nodes_in_region(account_session, region_name):
+def count_eks_nodes_in_region(eks_client):
     """
     Count EKS nodes in a specific region, including nodes within nodegroups.
 
     Args:
-        account_session (boto3.Session): Session for the AWS account.
-        region_name (str): AWS region name.
+        eks_client (botocore.client.EKS): EKS client for the region.
 
     Returns:
         int: Count of EKS nodes.
     """
     try:
-        eks_client = account_session.client('eks', region_name=region_name)
-        response = eks_client.list_clusters()
-
         eks_node_count = 0
 
-        for cluster_name in response.get('clusters', []):
+        for cluster_name in list_eks_cluster_names(eks_client):
             # Describe the cluster to get details, including nodegroups
             cluster_details = eks_client.describe_cluster(name=cluster_name)
 
@@ -116,167 +334,352 @@ def count_eks_nodes_in_region(account_session, region_name):
 
         return eks_node_count
     except Exception as e:
+        log_count_error('EKS nodes', eks_client, e)
         return 0
 
-def count_running_ec2_instances_in_region(account_session, region_name):
+def count_running_ec2_instances_in_region(ec2_client):
     """
     Count running EC2 instances in a specific region.
 
     Args:
-        account_session (boto3.Session): Session for the AWS account.
-        region_name (str): AWS region name.
+        ec2_client (botocore.client.EC2): EC2 client for the region.
 
     Returns:
         int: Count of running EC2 instances.
     """
     try:
-        ec2_client = account_session.client('ec2', region_name=region_name)
-
-        paginator = ec2_client.get_paginator('describe_instances')
         running_ec2_instance_count = 0
 
-        for page in paginator.paginate(Filters=[{'Name': 'instance-state-name', 'Values': ['running']}]):
-            for reservation in page['Reservations']:
-                running_ec2_instance_count += len(reservation['Instances'])
+        # DescribeInstanceStatus only reports running instances unless IncludeAllInstances is set,
+        # and returns a small status record instead of the full instance description
+        response = ec2_client.describe_instance_status(IncludeAllInstances=False, MaxResults=1000)
+        while True:
+            running_ec2_instance_count += len(response.get('InstanceStatuses', []))
+
+            next_token = response.get('NextToken')
+            if not next_token:
+                break
+            response = ec2_client.describe_instance_status(IncludeAllInstances=False, MaxResults=1000, NextToken=next_token)
 
         return running_ec2_instance_count
     except Exception as e:
+        log_count_error('running EC2 instances', ec2_client, e)
         return 0
 
-def count_lambda_functions_in_region(account_session, region_name):
+def count_lambda_functions_in_region(lambda_client):
     """
     Count Lambda functions in a specific region.
 
     Args:
-        account_session (boto3.Session): Session for the AWS account.
-        region_name (str): AWS region name.
+        lambda_client (botocore.client.Lambda): Lambda client for the region.
 
     Returns:
         int: Count of Lambda functions.
     """
     try:
-        lambda_client = account_session.client('lambda', region_name=region_name)
-        response = lambda_client.list_functions()
+        lambda_function_count = 0
+
+        # ListFunctions caps MaxItems at 50 per page
+        response = lambda_client.list_functions(MaxItems=50)
+        while True:
+            lambda_function_count += len(response.get('Functions', []))
+
+            next_marker = response.get('NextMarker')
+            if not next_marker:
+                break
+            response = lambda_client.list_functions(MaxItems=50, Marker=next_marker)
 
-        lambda_function_count = len(response.get('Functions', []))
         return lambda_function_count
     except Exception as e:
+        log_count_error('Lambda functions', lambda_client, e)
         return 0
 
-def count_ecs_fargate_tasks_in_region(account_session, region_name):
+def count_ecs_fargate_tasks_in_cluster(ecs_client, cluster_arn):
+    """
+    Count ECS Fargate tasks in a single cluster with pagination support.
+
+    Args:
+        ecs_client (botocore.client.ECS): ECS client for the region.
+        cluster_arn (str): ARN of the ECS cluster.
+
+    Returns:
+        int: Count of ECS Fargate tasks in the cluster.
+    """
+    ecs_fargate_task_count = 0
+    paginator = ecs_client.get_paginator('list_tasks')
+
+    for page in paginator.paginate(cluster=cluster_arn, launchType='FARGATE'):
+        ecs_fargate_task_count += len(page.get('taskArns', []))
+
+    return ecs_fargate_task_count
+
+def count_ecs_fargate_tasks_in_region(ecs_client):
     """
     Count ECS Fargate tasks in a specific region.
 
     Args:
-        account_session (boto3.Session): Session for the AWS account.
-        region_name (str): AWS region name.
+        ecs_client (botocore.client.ECS): ECS client for the region.
 
     Returns:
         int: Count of ECS Fargate tasks.
     """
     try:
-        ecs_client = account_session.client('ecs', region_name=region_name)
-        response = ecs_client.list_clusters()
+        cluster_arns = []
+        paginator = ecs_client.get_paginator('list_clusters')
+
+        for page in paginator.paginate():
+            cluster_arns.extend(page.get('clusterArns', []))
 
-        ecs_fargate_task_count = 0
+        if not cluster_arns:
+            return 0
 
-        for cluster_arn in response.get('clusterArns', []):
-            tasks_response = ecs_client.list_tasks(cluster=cluster_arn)
-            ecs_fargate_task_count += len(tasks_response.get('taskArns', []))
+        # Count tasks in each cluster concurrently
+        task_counts = fanout_executor.map(
+            count_ecs_fargate_tasks_in_cluster,
+            [ecs_client] * len(cluster_arns),
+            cluster_arns
+        )
+        ecs_fargate_task_count = sum(task_counts)
 
         return ecs_fargate_task_count
     except Exception as e:
+        log_count_error('ECS Fargate tasks', ecs_client, e)
         return 0
 
-def count_eks_instances_in_region(account_session, region_name):
+def count_eks_instances_in_region(eks_client):
     """
     Count EKS instances in a specific region.
 
     Args:
-        account_session (boto3.Session): Session for the AWS account.
-        region_name (str): AWS region name.
+        eks_client (botocore.client.EKS): EKS client for the region.
 
     Returns:
         int: Count of EKS instances.
     """
     try:
-        eks_client = account_session.client('eks', region_name=region_name)
-        response = eks_client.list_clusters()
-
-        eks_instance_count = len(response.get('clusters', []))
+        eks_instance_count = len(list_eks_cluster_names(eks_client))
         return eks_instance_count
     except Exception as e:
+        log_count_error('EKS instances', eks_client, e)
         return 0
 
 
-def count_ecr_repositories_in_region(account_session, region_name):
+def count_ecr_images_in_repository(ecr_client, repository_name):
     """
-    Count ECR repositories in a specific region with pagination support.
+    Count ECR images in a single repository with pagination support.
+
+    Errors are logged and counted as 0 so that one unreadable or deleted
+    repository does not discard the counts of the others.
 
     Args:
-        account_session (boto3.Session): Session for the AWS account.
-        region_name (str): AWS region name.
+        ecr_client (botocore.client.ECR): ECR client for the region.
+        repository_name (str): Name of the ECR repository.
 
     Returns:
-        int: Count of ECR repositories.
+        int: Count of ECR images in the repository.
     """
-    try:
-        ecr_client = account_session.client('ecr', region_name=region_name)
+    ecr_image_count = 0
 
-        repository_count = 0
-        paginator = ecr_client.get_paginator('describe_repositories')
+    try:
+        response = ecr_client.describe_images(repositoryName=repository_name, maxResults=1000)
+        while True:
+            ecr_image_count += len(response.get('imageDetails', []))
 
-        for page in paginator.paginate():
-            repositories = page.get('repositories', [])
-            repository_count += len(repositories)
+            next_token = response.get('nextToken')
+            if not next_token:
+                break
+            response = ecr_client.describe_images(repositoryName=repository_name, maxResults=1000, nextToken=next_token)
 
-        return repository_count
+        return ecr_image_count
     except Exception as e:
+        log_count_error(f'ECR images in repository {repository_name}', ecr_client, e)
         return 0
 
 
-def count_ecr_images_in_region(account_session, region_name):
+def count_ecr_in_region(ecr_client):
     """
-    Count ECR images in a specific region.
+    Count ECR repositories and images in a specific region.
+
+    Repositories are listed once and their images are counted concurrently.
 
     Args:
-        account_session (boto3.Session): Session for the AWS account.
-        region_name (str): AWS region name.
+        ecr_client (botocore.client.ECR): ECR client for the region.
 
     Returns:
-        int: Count of ECR images.
+        tuple: Count of ECR repositories and count of ECR images.
     """
     try:
-        ecr_client = account_session.client('ecr', region_name=region_name)
-        response = ecr_client.describe_repositories()
+        repository_names = []
+        paginator = ecr_client.get_paginator('describe_repositories')
 
-        ecr_image_count = 0
+        for page in paginator.paginate(PaginationConfig={'PageSize': 1000}):
+            for repository in page.get('repositories', []):
+                repository_names.append(repository['repositoryName'])
 
-        for repository in response.get('repositories', []):
-            image_response = ecr_client.describe_images(repositoryName=repository['repositoryName'])
-            ecr_image_count += len(image_response.get('imageDetails', []))
+        if not repository_names:
+            return 0, 0
 
-        return ecr_image_count
+        # Count images in each repository concurrently
+        image_counts = fanout_executor.map(
+            count_ecr_images_in_repository,
+            [ecr_client] * len(repository_names),
+            repository_names
+        )
+        ecr_image_count = sum(image_counts)
+
+        return len(repository_names), ecr_image_count
     except Exception as e:
-        return 0
+        log_count_error('ECR repositories and images', ecr_client, e)
+        return 0, 0
 
-def get_active_regions(account_session):
+def get_active_regions(account_session, account_id):
     """
     Get the list of active regions for an AWS account.
 
     Args:
         account_session (boto3.Session): Session for the AWS account.
+        account_id (str): AWS account ID, used as the cache key.
 
     Returns:
         list: List of active AWS region names.
     """
     try:
-        ec2_client = account_session.client('ec2', region_name='us-east-1')  # Use us-east-1 as a common region
-        regions = [region['RegionName'] for region in ec2_client.describe_regions()['Regions']]
+        ec2_client = account_session.client('ec2', region_name='us-east-1', config=BOTO_CFG)  # Use us-east-1 as a common region
+        regions = get_cached(
+            f"regions:{account_id}",
+            lambda: [region['RegionName'] for region in ec2_client.describe_regions()['Regions']]
+        )
         return regions, None
     except Exception as e:
         return None, e
 
+def list_member_account_ids(org_client, management_account_id):
+    """
+    List the IDs of all accounts in the organization.
+
+    Args:
+        org_client (botocore.client.Organizations): Organizations client for the management account.
+        management_account_id (str): AWS account ID of the management account, used as the cache key.
+
+    Returns:
+        list: AWS account IDs in the organization.
+    """
+    def fetch_member_account_ids():
+        member_account_ids = []
+
+        paginator = org_client.get_paginator('list_accounts')
+        for page in tqdm(paginator.paginate(), desc="Fetching Member Accounts"):
+            for account in page['Accounts']:
+                member_account_ids.append(account['Id'])
+
+        return member_account_ids
+
+    return get_cached(f"accounts:{management_account_id}", fetch_member_account_ids)
+
+def count_account_resources(account_session, active_regions, service_regions):
+    """
+    Count resources concurrently across the active regions of an account.
+
+    Args:
+        account_session (boto3.Session): Session for the AWS account.
+        active_regions (list): AWS region names to count resources in.
+        service_regions (dict): Set of region names keyed by service name.
+
+    Returns:
+        list: Total resource counts across the regions, in CSV column order.
+    """
+    resource_counts = list(region_executor.map(
+        count_resources_in_region,
+        [account_session] * len(active_regions),
+        active_regions,
+        [service_regions] * len(active_regions)
+    ))
+
+    if not resource_counts:
+        return [0] * len(RESOURCE_LABELS)
+
+    # Sum each resource column across the regions
+    return [sum(region_counts) for region_counts in zip(*resource_counts)]
+
+def log_account_counts(title, totals):
+    """
+    Log the total resource counts for an account.
+
+    The block is logged as a single record so that accounts counted
+    concurrently cannot interleave their lines.
+
+    Args:
+        title (str): Heading line identifying the account.
+        totals (list): Total resource counts, in CSV column order.
+    """
+    lines = [title]
+    for resource_label, total in zip(RESOURCE_LABELS, totals):
+        lines.append(f"  Total {resource_label}: {total}")
+    logging.info("\n".join(lines))
+
+def process_account(member_account_id, sts_client, service_regions):
+    """
+    Count resources across all active regions of a member account.
+
+    Args:
+        member_account_id (str): AWS account ID of the member account.
+        sts_client (botocore.client.STS): STS client for the management account.
+        service_regions (dict): Set of region names keyed by service name.
+
+    Returns:
+        list: CSV row with the resource counts for the account, or None on error.
+    """
+    # Create a new session for the member account by assuming the role
+    member_account_session, session_error = assume_role_and_get_session(
+        member_account_id,
+        'OrganizationAccountAccessRole',
+        'CountResources',
+        sts_client
+    )
+
+    if session_error:
+        logging.error(f"Error creating session for account {member_account_id}: {session_error}")
+        return None
+
+    # Get the list of active regions for the member account
+    active_regions, regions_error = get_active_regions(member_account_session, member_account_id)
+
+    if regions_error:
+        logging.error(f"Error getting active regions for account {member_account_id}: {regions_error}")
+        return None
+
+    # Count resources across the active regions and log the totals
+    totals = count_account_resources(member_account_session, active_regions, service_regions)
+    log_account_counts(f"Member Account {member_account_id} Resource Counts:", totals)
+
+    return [member_account_id] + totals
+
+def start_csv_writer(csv_file):
+    """
+    Start a thread that writes queued rows to the CSV file.
+
+    Args:
+        csv_file (file): Open CSV file to write to.
+
+    Returns:
+        queue.Queue: Queue of rows to write. Put None to stop the writer.
+        threading.Thread: The writer thread.
+    """
+    csv_queue = queue.Queue()
+
+    def write_rows():
+        csv_writer = csv.writer(csv_file)
+        while True:
+            row = csv_queue.get()
+            if row is None:
+                break
+            csv_writer.writerow(row)
+            csv_file.flush()
+
+    writer_thread = threading.Thread(target=write_rows, daemon=True)
+    writer_thread.start()
+    return csv_queue, writer_thread
+
 def count_resources(input_type, management_access_key, management_secret_key):
     """
     Count AWS resources either at the organization or account level.
@@ -305,244 +708,99 @@ def count_resources(input_type, management_access_key, management_secret_key):
     # Create an org_client outside of the if block
     org_client = management_session.client('organizations')
 
-    # Create a list to store the results
-    results = []
-
-    # Organization-level resource counting
-    if input_type == 'org':
-        # Gather resources for the management account using provided credentials
-        # Get the list of active regions for the management account
-        active_regions, regions_error = get_active_regions(management_session)
-
-        if regions_error:
-            logging.error(f"Error getting active regions for the management account: {regions_error}")
-            exit()
-
-        # Initialize counts to zero for the management account
-        total_running_ec2_instances = 0
-        total_lambda_function_count = 0
-        total_ecs_fargate_task_count = 0
-        total_eks_instance_count = 0
-        total_ecr_repository_count = 0
-        total_ecr_image_count = 0
-        total_eks_node_count = 0  # Initialize EKS node count
-
-        # Iterate over active regions and count resources concurrently
-        with ThreadPoolExecutor(max_workers=30) as executor:
-            resource_counts = list(executor.map(
-                count_resources_in_region,
-                [management_session] * len(active_regions),
-                active_regions
-            ))
-
-        # Aggregate resource counts from different regions
-        for counts in resource_counts:
-            total_running_ec2_instances += counts['running_ec2_instances']
-            total_lambda_function_count += counts['lambda_functions']
-            total_ecs_fargate_task_count += counts['ecs_fargate_tasks']
-            total_eks_instance_count += counts['eks_instances']
-            total_ecr_repository_count += counts['ecr_repositories']
-            total_ecr_image_count += counts['ecr_images']
-            total_eks_node_count += counts['eks_nodes']  # Add EKS node count
-
-        # Print the total counts for the management account
-        logging.info(f"  Management Account {management_account_id} Resource Counts:")
-        logging.info(f"  Total Running EC2 Instances: {total_running_ec2_instances}")
-        logging.info(f"  Total Lambda Functions: {total_lambda_function_count}")
-        logging.info(f"  Total ECS Fargate Tasks: {total_ecs_fargate_task_count}")
-        logging.info(f"  Total EKS Instances: {total_eks_instance_count}")
-        logging.info(f"  Total ECR Repositories: {total_ecr_repository_count}")
-        logging.info(f"  Total ECR Images: {total_ecr_image_count}")
-        logging.info(f"  Total EKS Nodes: {total_eks_node_count}\n")  # Log EKS node count
-
-        # Append the results to the list
-        results.append([
-            management_account_id,
-            total_running_ec2_instances,
-            total_lambda_function_count,
-            total_ecs_fargate_task_count,
-            total_eks_instance_count,
-            total_ecr_repository_count,
-            total_ecr_image_count,
-            total_eks_node_count  # Add EKS node count
-        ])
-
-        # Append the results to the CSV file immediately
-        with open(csv_file_name, 'a', newline='') as csv_file:
-            csv_writer = csv.writer(csv_file)
-
-            # Write the data rows to the CSV file
-            csv_writer.writerows(results)
-
-        # Clear results for the next member account
-        results.clear()
-
-        # Gather resources for member accounts
-        # List all member account IDs within the organization with progress bar
-        member_account_ids = []
+    # Create one STS client against the regional endpoint and reuse its connections for every role assumption
+    sts_client = management_session.client(
+        'sts',
+        region_name='us-east-1',
+        endpoint_url='https://sts.us-east-1.amazonaws.com',
+        config=BOTO_CFG
+    )
 
-        paginator = org_client.get_paginator('list_accounts')
-        for page in tqdm(paginator.paginate(), desc="Fetching Member Accounts"):
-            for account in page['Accounts']:
-                member_account_ids.append(account['Id'])
+    # Look up which regions offer each service so unsupported region/service pairs are skipped
+    service_regions = get_service_regions(management_session)
 
-        # Loop through each member account
-        for member_account_id in tqdm(member_account_ids, desc="Processing Member Accounts"):
-            # Create a new session for each member account by assuming the role
-            member_account_session, session_error = assume_role_and_get_session(
-                member_account_id,
-                'OrganizationAccountAccessRole',
-                'CountResources',
-                management_session
-            )
+    # Open the CSV file once for the whole run and hand rows to a single writer thread
+    csv_file = open(csv_file_name, 'w', newline='', buffering=1 << 20)
+    csv_queue, writer_thread = start_csv_writer(csv_file)
+    try:
+        csv_queue.put(CSV_HEADER)
+
+        # Organization-level resource counting
+        if input_type == 'org':
+            # Gather resources for the management account using provided credentials
+            # Get the list of active regions for the management account
+            active_regions, regions_error = get_active_regions(management_session, management_account_id)
+
+            if regions_error:
+                logging.error(f"Error getting active regions for the management account: {regions_error}")
+                exit()
+
+            # Count resources across the active regions and log the totals
+            totals = count_account_resources(management_session, active_regions, service_regions)
+            log_account_counts(f"Management Account {management_account_id} Resource Counts:", totals)
+
+            # Write the results to the CSV file immediately
+            csv_queue.put([management_account_id] + totals)
+
+            # Gather resources for member accounts
+            # List all member account IDs within the organization with progress bar
+            member_account_ids = list_member_account_ids(org_client, management_account_id)
+
+            # Process member accounts concurrently and write each row as its account completes
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = [
+                    executor.submit(process_account, member_account_id, sts_client, service_regions)
+                    for member_account_id in member_account_ids
+                ]
+
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Processing Member Accounts"):
+                    account_row = future.result()
 
-            if session_error:
-                logging.error(f"Error creating session for account {member_account_id}: {session_error}")
-                continue
+                    if account_row is None:
+                        continue
 
-            # Get the list of active regions for the member account
-            active_regions, regions_error = get_active_regions(member_account_session)
+                    # Write the results to the CSV file immediately
+                    csv_queue.put(account_row)
+
+            logging.info(f"Results added to {csv_file_name}")
+
+        # Account-level resource counting
+        else:
+            # Get the account ID associated with the provided access keys
+            try:
+                response = sts_client.get_caller_identity()
+                account_id = response['Account']
+            except Exception as e:
+                logging.error(f"Error getting account ID: {e}")
+                exit()
+
+            # Get the list of active regions for the account
+            active_regions, regions_error = get_active_regions(management_session, account_id)
 
             if regions_error:
-                logging.error(f"Error getting active regions for account {member_account_id}: {regions_error}")
-                continue
-
-            # Initialize counts to zero for each member account
-            total_running_ec2_instances = 0
-            total_lambda_function_count = 0
-            total_ecs_fargate_task_count = 0
-            total_eks_instance_count = 0
-            total_ecr_repository_count = 0
-            total_ecr_image_count = 0
-            total_eks_node_count = 0  # Initialize EKS node count
-
-            # Iterate over active regions and count resources concurrently
-            with ThreadPoolExecutor(max_workers=30) as executor:
-                resource_counts = list(executor.map(
-                    count_resources_in_region,
-                    [member_account_session] * len(active_regions),
-                    active_regions
-                ))
-
-            # Aggregate resource counts from different regions
-            for counts in resource_counts:
-                total_running_ec2_instances += counts['running_ec2_instances']
-                total_lambda_function_count += counts['lambda_functions']
-                total_ecs_fargate_task_count += counts['ecs_fargate_tasks']
-                total_eks_instance_count += counts['eks_instances']
-                total_ecr_repository_count += counts['ecr_repositories']
-                total_ecr_image_count += counts['ecr_images']
-                total_eks_node_count += counts['eks_nodes']  # Add EKS node count
-
-            # Print the total counts for all regions in the member account
-            logging.info(f"Member Account {member_account_id} Resource Counts:")
-            logging.info(f"  Total Running EC2 Instances: {total_running_ec2_instances}")
-            logging.info(f"  Total Lambda Functions: {total_lambda_function_count}")
-            logging.info(f"  Total ECS Fargate Tasks: {total_ecs_fargate_task_count}")
-            logging.info(f"  Total EKS Instances: {total_eks_instance_count}")
-            logging.info(f"  Total ECR Repositories: {total_ecr_repository_count}")
-            logging.info(f"  Total ECR Images: {total_ecr_image_count}")
-            logging.info(f"  Total EKS Nodes: {total_eks_node_count}\n")  # Log EKS node count
-
-            # Append the results to the list
-            results.append([
-                member_account_id,
-                total_running_ec2_instances,
-                total_lambda_function_count,
-                total_ecs_fargate_task_count,
-                total_eks_instance_count,
-                total_ecr_repository_count,
-                total_ecr_image_count,
-                total_eks_node_count  # Add EKS node count
-            ])
-
-            # Append the results to the CSV file immediately
-            with open(csv_file_name, 'a', newline='') as csv_file:
-                csv_writer = csv.writer(csv_file)
-
-                # Write the data rows to the CSV file
-                csv_writer.writerows(results)
-
-            # Clear results for the next member account
-            results.clear()
-
-        logging.info(f"Results added to {csv_file_name}")
-
-    # Account-level resource counting
-    else:
-        # Get the account ID associated with the provided access keys
-        sts_client = management_session.client('sts')
+                logging.error(f"Error getting active regions for the account: {regions_error}")
+                exit()
 
-        try:
-            response = sts_client.get_caller_identity()
-            account_id = response['Account']
-        except Exception as e:
-            logging.error(f"Error getting account ID: {e}")
-            exit()
-
-        # Get the list of active regions for the account
-        active_regions, regions_error = get_active_regions(management_session)
-
-        if regions_error:
-            logging.error(f"Error getting active regions for the account: {regions_error}")
-            exit()
-
-        # Initialize counts to zero for the account
-        total_running_ec2_instances = 0
-        total_lambda_function_count = 0
-        total_ecs_fargate_task_count = 0
-        total_eks_instance_count = 0
-        total_ecr_repository_count = 0
-        total_ecr_image_count = 0
-        total_eks_node_count = 0  # Initialize EKS node count
-
-        # Iterate over active regions and count resources concurrently
-        with ThreadPoolExecutor(max_workers=30) as executor:
-            resource_counts = list(executor.map(
-                count_resources_in_region,
-                [management_session] * len(active_regions),
-                active_regions
-            ))
-
-        # Aggregate resource counts from different regions
-        for counts in resource_counts:
-            total_running_ec2_instances += counts['running_ec2_instances']
-            total_lambda_function_count += counts['lambda_functions']
-            total_ecs_fargate_task_count += counts['ecs_fargate_tasks']
-            total_eks_instance_count += counts['eks_instances']
-            total_ecr_repository_count += counts['ecr_repositories']
-            total_ecr_image_count += counts['ecr_images']
-            total_eks_node_count += counts['eks_nodes']  # Add EKS node count
-
-        # Print the total counts for all regions in the account
-        logging.info(f"Account {account_id} Resource Counts:")
-        logging.info(f"  Total Running EC2 Instances: {total_running_ec2_instances}")
-        logging.info(f"  Total Lambda Functions: {total_lambda_function_count}")
-        logging.info(f"  Total ECS Fargate Tasks: {total_ecs_fargate_task_count}")
-        logging.info(f"  Total EKS Instances: {total_eks_instance_count}")
-        logging.info(f"  Total ECR Repositories: {total_ecr_repository_count}")
-        logging.info(f"  Total ECR Images: {total_ecr_image_count}")
-        logging.info(f"  Total EKS Nodes: {total_eks_node_count}")  # Log EKS node count
-
-        # Append the results to the CSV file
-        with open(csv_file_name, 'a', newline='') as csv_file:
-            csv_writer = csv.writer(csv_file)
-
-            # Write the data rows to the CSV file
-            csv_writer.writerow([
-                account_id,
-                total_running_ec2_instances,
-                total_lambda_function_count,
-                total_ecs_fargate_task_count,
-                total_eks_instance_count,
-                total_ecr_repository_count,
-                total_ecr_image_count,
-                total_eks_node_count  # Add EKS node count
-            ])
-
-        logging.info(f"Results added to {csv_file_name}")
+            # Count resources across the active regions and log the totals
+            totals = count_account_resources(management_session, active_regions, service_regions)
+            log_account_counts(f"Account {account_id} Resource Counts:", totals)
+
+            # Write the results to the CSV file
+            csv_queue.put([account_id] + totals)
+
+            logging.info(f"Results added to {csv_file_name}")
+    finally:
+        csv_queue.put(None)
+        writer_thread.join()
+        csv_file.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count AWS resources across an organization or account.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignore and refresh the cached organization, account and region metadata.")
+    args = parser.parse_args()
+    cache_enabled = not args.no_cache
+
     # Input type: 'org' for organization-level resource counting or 'account' for account-level counting
     input_type = input("Enter 'org' for organization-level resource counting or 'account' for account-level counting: ")
 
@@ -554,21 +812,5 @@ if __name__ == "__main__":
     management_access_key = input("Enter the access key for the account: ")
     management_secret_key = input("Enter the secret key for the account: ")
 
-    # Initialize the CSV file with headers
-    with open(csv_file_name, 'w', newline='') as csv_file:
-        csv_writer = csv.writer(csv_file)
-
-        # Write the header row to the CSV file
-        csv_writer.writerow([
-            'Account ID',
-            'Running EC2 Instances',
-            'Lambda Functions',
-            'ECS Fargate Tasks',
-            'EKS Instances',
-            'ECR Repositories',
-            'ECR Images',
-            'EKS Nodes'  # Add EKS node count
-        ])
-
     # Count AWS resources based on the input type
     count_resources(input_type, management_access_key, management_secret_key)
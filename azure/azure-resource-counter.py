@@ -1,21 +1,72 @@
 import logging
 import csv
 from azure.identity import ClientSecretCredential
-from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.resource import ResourceManagementClient
 from azure.mgmt.subscription import SubscriptionClient
-from azure.mgmt.web import WebSiteManagementClient
-from azure.mgmt.containerinstance import ContainerInstanceManagementClient
-from azure.mgmt.containerservice import ContainerServiceClient
 from azure.mgmt.containerregistry import ContainerRegistryManagementClient
+from azure.containerregistry import ContainerRegistryClient
+from azure.mgmt.resourcegraph import ResourceGraphClient
+from azure.mgmt.resourcegraph.models import QueryRequest, QueryRequestOptions
+from azure.core.pipeline.transport import RequestsTransport
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tqdm import tqdm
-import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import functools
 import os
+import queue
+import threading
 
 # Constants
 CSV_FILE_PATH = 'azure_resource_counts.csv'
 ERROR_LOG_FILE_PATH = 'azure_resource_counts_error.log'
 
+# Resource types counted for each subscription, in CSV column order
+RESOURCE_TYPES = [
+    "Virtual Machines",
+    "Web Apps",
+    "Container Instances",
+    "AKS Clusters",
+    "ACR Registries",
+    "ACR Images",
+    "Azure Functions",
+]
+
+# ARM resource types mapped to the resource types they are counted as
+ARM_RESOURCE_TYPES = {
+    "microsoft.compute/virtualmachines": "Virtual Machines",
+    "microsoft.web/sites": "Web Apps",
+    "microsoft.containerinstance/containergroups": "Container Instances",
+    "microsoft.containerservice/managedclusters": "AKS Clusters",
+    "microsoft.containerregistry/registries": "ACR Registries",
+}
+
+# ARM resource types counted through the generic resource listing; registries are listed separately to reach their images
+LISTED_RESOURCE_TYPES = [
+    "Microsoft.Compute/virtualMachines",
+    "Microsoft.Web/sites",
+    "Microsoft.ContainerInstance/containerGroups",
+    "Microsoft.ContainerService/managedClusters",
+]
+
+# Resource Graph query returning resource counts per type in one round trip
+RESOURCE_GRAPH_QUERY = (
+    "Resources"
+    " | where type in~ ('" + "', '".join(ARM_RESOURCE_TYPES) + "')"
+    " | extend isFunctionApp = tolower(kind) contains 'functionapp'"
+    " | summarize resourceCount = count() by type = tolower(type), isFunctionApp"
+)
+
+# Connections kept open per host, sized so that concurrent requests to management.azure.com do not queue for a socket
+HTTP_POOL_SIZE = 64
+
+# Subscriptions counted at the same time, kept low to stay under the ARM read limits of the tenant
+SUBSCRIPTION_CONCURRENCY = 4
+
+# Registries whose images are counted at the same time, overridable with the ACR_CONCURRENCY environment variable
+ACR_CONCURRENCY = int(os.environ.get("ACR_CONCURRENCY", 16))
+
 # Configure logging
 logging.basicConfig(filename='azure_resource_counts.log', level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
 error_logger = logging.getLogger('azure_errors')
@@ -25,6 +76,16 @@ error_logger.setLevel(logging.ERROR)
 azure_logger = logging.getLogger('azure')
 azure_logger.setLevel(logging.WARNING)
 
+# Create one HTTP transport with a large connection pool for every Azure client to share
+def create_transport():
+    session = requests.Session()
+    # Only connection failures are retried here; the Azure SDK retry policy already backs off on 429 and 5xx responses
+    session.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE,
+                                          max_retries=Retry(total=5, status=0, backoff_factor=0.5)))
+    return RequestsTransport(session=session, session_owner=False)
+
+transport = create_transport()
+
 # Authenticate and return an Azure client credential.
 def authenticate_client(client_id, client_secret, tenant_id):
     credential = ClientSecretCredential(tenant_id, client_id, client_secret)
@@ -32,191 +93,159 @@ def authenticate_client(client_id, client_secret, tenant_id):
 
 # List Azure subscriptions using the provided credential
 def list_subscriptions(credential):
-    subscription_client = SubscriptionClient(credential)
+    subscription_client = SubscriptionClient(credential, transport=transport)
     return list(subscription_client.subscriptions.list())
 
-# Function to count resources in a resource group
-def count_resources_in_resource_group(credential, subscription_id, resource_group, result_dict):
-    counts = {
-        "Virtual Machines": count_virtual_machines(credential, subscription_id, resource_group),
-        "Web Apps": count_web_apps(credential, subscription_id, resource_group),
-        "Container Instances": count_container_instances(credential, subscription_id, resource_group),
-        "AKS Clusters": count_aks_clusters(credential, subscription_id, resource_group),
-        "ACR Registries": count_acr_registries(credential, subscription_id, resource_group),
-        "ACR Images": count_acr_images(credential, subscription_id, resource_group),
-        "Azure Functions": count_azure_functions(credential, subscription_id, resource_group),
-    }
+# Create the Resource Graph client once; it is not tied to a subscription, so every subscription shares it
+@functools.lru_cache(maxsize=None)
+def get_resource_graph_client(credential):
+    return ResourceGraphClient(credential, transport=transport)
 
-    result_dict[resource_group] = counts
+# Create the management clients for a subscription; every counter for that subscription shares them
+def create_clients(credential, subscription_id):
+    return {
+        "resource": ResourceManagementClient(credential, subscription_id, transport=transport),
+        "container_registry": ContainerRegistryManagementClient(credential, subscription_id, transport=transport),
+    }
 
-# Function to count virtual machines in a resource group
-def count_virtual_machines(credential, subscription_id, resource_group):
-    compute_client = ComputeManagementClient(credential, subscription_id)
-    total_vm_count = 0
+# Function to count VMs, web apps, Azure Functions, container instances and AKS clusters in a subscription
+# with one generic resource listing, which returns only each resource's id, type and kind
+def count_generic_resources(resource_client, subscription_id):
+    total_counts = dict.fromkeys(RESOURCE_TYPES, 0)
+    resource_filter = " or ".join(f"resourceType eq '{resource_type}'" for resource_type in LISTED_RESOURCE_TYPES)
 
     try:
-        vm_paged = compute_client.virtual_machines.list(resource_group)
-        for _ in vm_paged:
-            total_vm_count += 1
+        for resource in resource_client.resources.list(filter=resource_filter):
+            resource_type = resource.type.lower()
+            total_counts[ARM_RESOURCE_TYPES[resource_type]] += 1
+            if resource_type == "microsoft.web/sites" and resource.kind and "functionapp" in resource.kind.lower():
+                total_counts["Azure Functions"] += 1
 
-        return total_vm_count
+        return total_counts
     except Exception as e:
-        logging.error(f"Error counting VMs in {resource_group}: {str(e)}")
-        return 0
+        logging.error(f"Error counting resources in Subscription ID {subscription_id}: {str(e)}")
+        return dict.fromkeys(RESOURCE_TYPES, 0)
 
-# Function to count web apps in a resource group
-def count_web_apps(credential, subscription_id, resource_group):
-    website_client = WebSiteManagementClient(credential, subscription_id)
-    total_web_app_count = 0
+# Function to count the images in one ACR registry through the registry data plane
+def count_acr_images_in_registry(registry, credential, subscription_id):
+    total_acr_image_count = 0
 
+    # Images are not exposed by the management plane, so read each repository's manifest count from the data plane
     try:
-        web_apps = website_client.web_apps.list_by_resource_group(resource_group)
-        for _ in web_apps:
-            total_web_app_count += 1
-
-        return total_web_app_count
+        registry_client = ContainerRegistryClient(f"https://{registry.login_server}", credential,
+                                                  audience="https://management.azure.com", transport=transport)
+        for repository_name in registry_client.list_repository_names():
+            total_acr_image_count += registry_client.get_repository_properties(repository_name).manifest_count
     except Exception as e:
-        logging.error(f"Error counting Web Apps in {resource_group}: {str(e)}")
-        return 0
+        error_logger.error(f"Error counting ACR images in {registry.name} in Subscription ID {subscription_id}: {str(e)}")
 
-# Function to count container instances in a resource group
-def count_container_instances(credential, subscription_id, resource_group):
-    container_instance_client = ContainerInstanceManagementClient(credential, subscription_id)
-    total_aci_count = 0
+    return total_acr_image_count
 
+# Function to count ACR registries and the images they hold in a subscription
+def count_acr(container_registry_client, credential, subscription_id):
     try:
-        aci_paged = container_instance_client.container_groups.list_by_resource_group(resource_group)
-        for _ in aci_paged:
-            total_aci_count += 1
-
-        return total_aci_count
+        acr_registries = list(container_registry_client.registries.list())
     except Exception as e:
-        logging.error(f"Error counting ACIs in {resource_group}: {str(e)}")
-        return 0
+        logging.error(f"Error counting ACR registries in Subscription ID {subscription_id}: {str(e)}")
+        return 0, 0
 
-# Function to count AKS clusters in a resource group
-def count_aks_clusters(credential, subscription_id, resource_group):
-    container_service_client = ContainerServiceClient(credential, subscription_id)
-    total_aks_count = 0
+    if not acr_registries:
+        return 0, 0
 
-    try:
-        aks_paged = container_service_client.managed_clusters.list_by_resource_group(resource_group)
-        for _ in aks_paged:
-            total_aks_count += 1
+    # Count images in several registries at once, bounded so that wide subscriptions are not throttled
+    total_acr_image_count = 0
+    with ThreadPoolExecutor(max_workers=min(ACR_CONCURRENCY, len(acr_registries))) as executor:
+        futures = [executor.submit(count_acr_images_in_registry, registry, credential, subscription_id) for registry in acr_registries]
+        for future in as_completed(futures):
+            total_acr_image_count += future.result()
 
-        return total_aks_count
-    except Exception as e:
-        logging.error(f"Error counting AKS clusters in {resource_group}: {str(e)}")
-        return 0
+    return len(acr_registries), total_acr_image_count
 
-# Function to count ACR registries in a resource group
-def count_acr_registries(credential, subscription_id, resource_group):
-    container_registry_client = ContainerRegistryManagementClient(credential, subscription_id)
-    total_acr_registry_count = 0
+# Function to count resources in a subscription with a single Azure Resource Graph query
+def count_resources_with_resource_graph(credential, subscription_id, clients):
+    resource_graph_client = get_resource_graph_client(credential)
+    total_counts = dict.fromkeys(RESOURCE_TYPES, 0)
+    skip_token = None
 
     try:
-        acr_registries = container_registry_client.registries.list_by_resource_group(resource_group)
-        for _ in acr_registries:
-            total_acr_registry_count += 1
-
-        return total_acr_registry_count
+        while True:
+            response = resource_graph_client.resources(QueryRequest(
+                subscriptions=[subscription_id],
+                query=RESOURCE_GRAPH_QUERY,
+                options=QueryRequestOptions(result_format="objectArray", top=1000, skip_token=skip_token),
+            ))
+
+            for row in response.data:
+                total_counts[ARM_RESOURCE_TYPES[row["type"]]] += row["resourceCount"]
+                if row["type"] == "microsoft.web/sites" and row["isFunctionApp"]:
+                    total_counts["Azure Functions"] += row["resourceCount"]
+
+            skip_token = response.skip_token
+            if not skip_token:
+                break
     except Exception as e:
-        logging.error(f"Error counting ACR registries in {resource_group}: {str(e)}")
-        return 0
+        logging.error(f"Error querying Resource Graph for Subscription ID {subscription_id}, "
+                      f"counting with the service APIs instead: {str(e)}")
+        return None
 
+    # Images are not ARM resources, so count them through the registries when there are any
+    if total_counts["ACR Registries"]:
+        total_counts["ACR Images"] = count_acr(clients["container_registry"], credential, subscription_id)[1]
 
+    return total_counts
 
-# Function to count ACR images in a resource group
-def count_acr_images(credential, subscription_id, resource_group):
-    container_registry_client = ContainerRegistryManagementClient(credential, subscription_id)
-    total_acr_image_count = 0
-
-    try:
-        acr_repos = container_registry_client.registries.list_by_resource_group(resource_group)
-        for repo in acr_repos:
-            if hasattr(repo, 'registry_name'):
-                registry_name = repo.registry_name
-
-                # List the repositories in the registry
-                repositories = container_registry_client.repositories.list(resource_group, registry_name)
-
-                for repository in repositories:
-                    # List the manifests within each repository
-                    manifests = container_registry_client.manifests.list(resource_group, registry_name, repository)
-                    total_acr_image_count += len(list(manifests))
-
-        return total_acr_image_count
-    except Exception as e:
-        error_logger.error(f"Error counting ACR images in {resource_group}: {str(e)}")
-        return 0
+# Function to count resources in a subscription with the generic resource listing and the ACR registries
+def count_resources_by_listing(credential, subscription_id, clients):
+    # The listings are independent, so run them at the same time and wait for the slowest
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        generic_future = executor.submit(count_generic_resources, clients["resource"], subscription_id)
+        acr_future = executor.submit(count_acr, clients["container_registry"], credential, subscription_id)
 
-# Function to count Azure Functions in a resource group
-def count_azure_functions(credential, subscription_id, resource_group):
-    web_client = WebSiteManagementClient(credential, subscription_id)
-    total_azure_functions = 0
+        total_counts = generic_future.result()
+        total_counts["ACR Registries"], total_counts["ACR Images"] = acr_future.result()
 
-    try:
-        web_apps = web_client.web_apps.list_by_resource_group(resource_group)
-        for app in web_apps:
-            if app.kind and "functionapp" in app.kind.lower():
-                total_azure_functions += 1
-
-        return total_azure_functions
-    except Exception as e:
-        logging.error(f"Error counting Azure Functions in {resource_group}: {str(e)}")
-        return 0
+    return total_counts
 
+# Start a thread that writes rows from a queue to the CSV file until it receives None
+def start_csv_writer(csv_file):
+    csv_queue = queue.Queue()
 
+    def write_rows():
+        csv_writer = csv.writer(csv_file)
+        while True:
+            row = csv_queue.get()
+            if row is None:
+                break
+            csv_writer.writerow(row)
+            csv_file.flush()
 
+    writer_thread = threading.Thread(target=write_rows, daemon=True)
+    writer_thread.start()
+    return csv_queue, writer_thread
 
 # Function to process a subscription and append counts to CSV
-def process_subscription(credential, subscription, csv_writer):
+def process_subscription(credential, subscription, csv_queue):
     subscription_id = subscription.subscription_id
     logging.info(f"Processing Subscription ID: {subscription_id}")
 
-    # Retrieve the list of resource groups in the subscription
-    resource_groups = ResourceManagementClient(credential, subscription_id).resource_groups.list()
-
-    # Create a dictionary to store counts for each resource group
-    result_dict = {}
-
-    # Create threads for counting resources in each resource group
-    threads = []
-    for resource_group in resource_groups:
-        thread = threading.Thread(target=count_resources_in_resource_group,
-                                  args=(credential, subscription_id, resource_group.name, result_dict))
-        threads.append(thread)
-        thread.start()
-
-    # Wait for all threads to finish
-    for thread in threads:
-        thread.join()
-
-    # Sum counts across resource groups
-    total_counts = {
-        "Virtual Machines": 0,
-        "Web Apps": 0,
-        "Container Instances": 0,
-        "AKS Clusters": 0,
-        "ACR Registries": 0,
-        "ACR Images": 0,
-        "Azure Functions": 0,
-    }
+    # Create the management clients once for the whole subscription
+    clients = create_clients(credential, subscription_id)
 
-    for counts in result_dict.values():
-        for resource_type, count in counts.items():
-            total_counts[resource_type] += count
+    # Count with a single Resource Graph query, falling back to the per-service listings
+    total_counts = count_resources_with_resource_graph(credential, subscription_id, clients)
+    if total_counts is None:
+        total_counts = count_resources_by_listing(credential, subscription_id, clients)
 
     # Log total counts for each resource type
     for resource_type, count in total_counts.items():
-        logging.info(f"Total {resource_type}: {count}")
+        logging.info(f"Total {resource_type} in Subscription ID {subscription_id}: {count}")
 
     # Log a message if no resources are found for any type
     for resource_type, count in total_counts.items():
         if count == 0:
             logging.info(f"No {resource_type} found in Subscription ID {subscription_id}")
     # Append counts to the CSV for this subscription
-    csv_writer.writerow([subscription_id] + list(total_counts.values()))
+    csv_queue.put([subscription_id] + list(total_counts.values()))
     logging.info(f"Counts for Subscription ID {subscription_id} saved in CSV")
     logging.info("-" * 50)
 
@@ -239,35 +268,40 @@ def main():
 
     # Create or append to the CSV file
     csv_exists = os.path.exists(CSV_FILE_PATH)
-    with open(CSV_FILE_PATH, mode='a', newline='') as csv_file:
-        csv_writer = csv.writer(csv_file)
-
-        # Write header row if the CSV file is newly created
-        if not csv_exists:
-            csv_writer.writerow(['Subscription ID', 'Virtual Machines', 'Web Apps', 'Container Instances', 'AKS Clusters',
-                                 'ACR Registries', 'ACR Images', 'Azure Functions'])
-
-        # Prompt the user to select the option
-        print("Select an option:")
-        print("1. Process all subscriptions")
-        print("2. Process a single subscription")
-        option = input("Enter your choice (1/2): ")
-
-        if option == "1":
-            # Process all subscriptions
-            pbar = tqdm(subscriptions, desc="Processing Subscriptions", unit="subscription")
-            for subscription in pbar:
-                process_subscription(credential, subscription, csv_writer)
-        elif option == "2":
-            # Process a single subscription
-            subscription_id = input("Enter the Subscription ID to process: ")
-            subscription = next((sub for sub in subscriptions if sub.subscription_id == subscription_id), None)
-            if subscription:
-                process_subscription(credential, subscription, csv_writer)
+    with open(CSV_FILE_PATH, mode='a', newline='', buffering=1 << 20) as csv_file:
+        csv_queue, writer_thread = start_csv_writer(csv_file)
+        try:
+            # Write header row if the CSV file is newly created
+            if not csv_exists:
+                csv_queue.put(['Subscription ID'] + RESOURCE_TYPES)
+
+            # Prompt the user to select the option
+            print("Select an option:")
+            print("1. Process all subscriptions")
+            print("2. Process a single subscription")
+            option = input("Enter your choice (1/2): ")
+
+            if option == "1":
+                # Process several subscriptions at a time; rows are written in the order subscriptions finish
+                with ThreadPoolExecutor(max_workers=SUBSCRIPTION_CONCURRENCY) as executor:
+                    futures = [executor.submit(process_subscription, credential, subscription, csv_queue)
+                               for subscription in subscriptions]
+                    for future in tqdm(as_completed(futures), total=len(futures), desc="Processing Subscriptions", unit="subscription"):
+                        future.result()
+            elif option == "2":
+                # Process a single subscription
+                subscription_id = input("Enter the Subscription ID to process: ")
+                subscription = next((sub for sub in subscriptions if sub.subscription_id == subscription_id), None)
+                if subscription:
+                    process_subscription(credential, subscription, csv_queue)
+                else:
+                    print("Subscription not found.")
             else:
-                print("Subscription not found.")
-        else:
-            print("Invalid option. Please select 1 or 2.")
+                print("Invalid option. Please select 1 or 2.")
+        finally:
+            # Stop the writer thread once every queued row is written
+            csv_queue.put(None)
+            writer_thread.join()
 
 if __name__ == "__main__":
     main()
@@ -1,69 +1,217 @@
+import atexit
 import logging
+import logging.handlers
 import os
 import csv
+from collections import Counter, defaultdict
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import google_auth_httplib2
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
 import concurrent.futures
-
-# Configure logging to save logs to a file
+import contextlib
+import functools
+import itertools
+import queue
+import threading
+from tqdm import tqdm
+
+# Configure logging to save logs to a file; threads only queue records and one listener thread writes them
 log_file = 'gcp_resource_counter.log'
-logging.basicConfig(filename=log_file, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+log_queue = queue.Queue()
+log_file_handler = logging.FileHandler(log_file)
+log_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log_listener = logging.handlers.QueueListener(log_queue, log_file_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[logging.handlers.QueueHandler(log_queue)])
 logger = logging.getLogger()
 logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
 
-
-# Function to list projects under a folder and its child folders recursively
-def list_projects_recursive(service, folder_id):
+# Cloud Asset Inventory asset types counted for each project, in CSV column order
+ASSET_TYPES = [
+    'compute.googleapis.com/Instance',
+    'cloudfunctions.googleapis.com/CloudFunction',
+    'container.googleapis.com/Cluster',
+    'artifactregistry.googleapis.com/Repository',
+    'artifactregistry.googleapis.com/DockerImage',
+]
+
+# CSV files are written next to the script
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+ORGANIZATION_CSV_PATH = os.path.join(SCRIPT_DIR, 'gcp_resource_counts.csv')
+PROJECT_CSV_PATH = os.path.join(SCRIPT_DIR, 'project_resource_counts.csv')
+
+# Header row of the CSV files
+CSV_HEADER = ['Project ID', 'Running Compute Instances', 'Cloud Functions', 'GKE Clusters', 'Artifacts Repositories',
+              'Docker Images']
+
+# Projects counted at the same time when Cloud Asset Inventory is unavailable, overridable with GCP_CONCURRENCY
+GCP_CONCURRENCY = int(os.environ.get('GCP_CONCURRENCY', 8))
+
+# Partial response masks for the Resource Manager listings, which only need project and folder names
+PROJECT_FIELDS = 'projects(name,projectId),nextPageToken'
+FOLDER_FIELDS = 'folders(name),nextPageToken'
+
+# Times a failed API request is retried with exponential backoff on rate limiting and server errors
+NUM_RETRIES = 5
+
+# API clients built so far, kept per thread because the httplib2 connection behind each client is not thread-safe
+thread_local = threading.local()
+
+# Long-lived worker threads for the per-project counters, so each thread keeps its API clients from project to project
+counter_executor = concurrent.futures.ThreadPoolExecutor(max_workers=GCP_CONCURRENCY * 4)
+
+# Long-lived worker threads for Artifact Registry locations and repositories, kept apart from the counter threads that wait on them
+artifact_executor = concurrent.futures.ThreadPoolExecutor(max_workers=GCP_CONCURRENCY * 4)
+
+# Function to read the discovery document bundled with the client library once for the whole run
+@functools.lru_cache(maxsize=None)
+def get_discovery_document(api, version):
+    return get_static_doc(api, version)
+
+# Function to build an API client once per thread and reuse it for every later call
+def get_service(api, version, credentials):
+    services = getattr(thread_local, 'services', None)
+    if services is None:
+        services = thread_local.services = {}
+    key = (api, version, id(credentials))
+    if key not in services:
+        services[key] = build_from_document(get_discovery_document(api, version), credentials=credentials)
+    return services[key]
+
+# Function to load service account credentials and fetch their access token before any worker thread needs it
+def load_credentials(service_account_key_file):
+    credentials = service_account.Credentials.from_service_account_file(
+        service_account_key_file, scopes=['https://www.googleapis.com/auth/cloud-platform'])
+    credentials.refresh(google_auth_httplib2.Request(httplib2.Http()))
+    return credentials
+
+# Function to list the (resource name, project ID) pairs of the projects directly in a folder and the IDs of its child folders
+def list_folder_contents(credentials, folder_id):
+    service = get_service('cloudresourcemanager', 'v3', credentials)
     projects = []
-    request = service.projects().list(parent=f"folders/{folder_id}")
+    request = service.projects().list(parent=f"folders/{folder_id}", fields=PROJECT_FIELDS)
     while request is not None:
         try:
-            response = request.execute()
+            response = request.execute(num_retries=NUM_RETRIES)
             for project in response.get('projects', []):
-                projects.append(project)
+                projects.append((project['name'], project['projectId']))
             request = service.projects().list_next(previous_request=request, previous_response=response)
         except Exception as e:
             error_message = f"An error occurred while listing projects in folder {folder_id}: {str(e)}"
             logging.error(error_message)
             break
-    # List child folders and their projects recursively
-    child_folders = service.folders().list(parent=f"folders/{folder_id}").execute().get('folders', [])
-    for child_folder in child_folders:
-        projects += list_projects_recursive(service, child_folder['name'].split('/')[-1])
+    return projects, list_child_folder_ids(service, f"folders/{folder_id}")
+
+# Function to list the IDs of the folders directly under an organization or folder, paginating through results
+def list_child_folder_ids(service, parent):
+    folder_ids = []
+    request = service.folders().list(parent=parent, fields=FOLDER_FIELDS)
+    while request is not None:
+        try:
+            response = request.execute(num_retries=NUM_RETRIES)
+            for folder in response.get('folders', []):
+                folder_ids.append(folder['name'].split('/')[-1])  # Extract the folder ID from the folder name
+            request = service.folders().list_next(previous_request=request, previous_response=response)
+        except Exception as e:
+            error_message = f"An error occurred while listing folders in {parent}: {str(e)}"
+            logging.error(error_message)
+            break
+    return folder_ids
+
+# Function to list the (resource name, project ID) pairs of projects under folders and all their child folders,
+# listing each level of the hierarchy concurrently
+def list_projects_in_folders(credentials, folder_ids):
+    projects = []
+    # Folders already listed, so that a folder reached twice is never listed again
+    visited_folder_ids = set(folder_ids)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:  # Adjust max_workers as needed
+        while folder_ids:
+            child_folder_ids = []
+            for folder_projects, folder_child_ids in executor.map(
+                    lambda folder_id: list_folder_contents(credentials, folder_id), folder_ids):
+                projects += folder_projects
+                for child_folder_id in folder_child_ids:
+                    if child_folder_id not in visited_folder_ids:
+                        visited_folder_ids.add(child_folder_id)
+                        child_folder_ids.append(child_folder_id)
+            folder_ids = child_folder_ids
     return projects
 
-# Function to list projects directly under an organization
+# Function to yield the (resource name, project ID) pairs of projects directly under an organization
 def list_projects_under_organization(service, organization_id):
-    projects = []
-    request = service.projects().list(parent=f"organizations/{organization_id}")
+    request = service.projects().list(parent=f"organizations/{organization_id}", fields=PROJECT_FIELDS)
     while request is not None:
         try:
-            response = request.execute()
+            response = request.execute(num_retries=NUM_RETRIES)
             for project in response.get('projects', []):
-                projects.append(project)
+                yield project['name'], project['projectId']
             request = service.projects().list_next(previous_request=request, previous_response=response)
         except Exception as e:
             error_message = f"An error occurred while listing projects under organization {organization_id}: {str(e)}"
             logging.error(error_message)
             break
-    return projects
+
+# Function to map the resource names of every project in an organization to their project IDs with two paged searches,
+# or None if the searches are not available
+def search_projects_in_organization(service, organization_id):
+    try:
+        # Search every visible folder and remember its parent
+        folder_parents = {}
+        request = service.folders().search(query='state:ACTIVE', fields='folders(name,parent),nextPageToken')
+        while request is not None:
+            response = request.execute(num_retries=NUM_RETRIES)
+            for folder in response.get('folders', []):
+                folder_parents[folder['name']] = folder.get('parent')
+            request = service.folders().search_next(previous_request=request, previous_response=response)
+
+        # Keep the folders whose chain of parents reaches the organization, following parents locally
+        parents_in_organization = {f"organizations/{organization_id}"}
+        for folder_name in folder_parents:
+            chain = []
+            parent = folder_name
+            while parent not in parents_in_organization and parent in folder_parents:
+                chain.append(parent)
+                parent = folder_parents[parent]
+            if parent in parents_in_organization:
+                parents_in_organization.update(chain)
+
+        # Search every visible project and keep those in the organization or one of its folders
+        project_ids = {}
+        request = service.projects().search(query='state:ACTIVE', fields='projects(name,projectId,parent),nextPageToken')
+        while request is not None:
+            response = request.execute(num_retries=NUM_RETRIES)
+            for project in response.get('projects', []):
+                if project.get('parent') in parents_in_organization:
+                    project_ids[project['name']] = project['projectId']
+            request = service.projects().search_next(previous_request=request, previous_response=response)
+        return project_ids
+    except Exception as e:
+        error_message = f"An error occurred while searching projects in organization {organization_id}, " \
+                        f"listing each folder instead: {str(e)}"
+        logging.error(error_message)
+        return None
 
 # Function to count running compute instances in a project
-def count_running_compute_instances(service, project_id, credentials):
+def count_running_compute_instances(project_id, credentials):
     try:
-        compute_service = build('compute', 'v1', credentials=credentials)
+        compute_service = get_service('compute', 'v1', credentials)
         # List running compute instances, paginating through results
         instances_count = 0
-        request = compute_service.instances().aggregatedList(project=project_id)
+        request = compute_service.instances().aggregatedList(
+            project=project_id, filter='status = RUNNING', maxResults=500,
+            fields='items/*/instances(id),nextPageToken')
         while request is not None:
-            response = request.execute()
-            for zone, instances_data in response.get('items', {}).items():
-                for instance in instances_data.get('instances', []):
-                    instances_count += 1
+            response = request.execute(num_retries=NUM_RETRIES)
+            instances_count += sum(len(instances_data.get('instances', ()))
+                                   for instances_data in response.get('items', {}).values())
             if 'nextPageToken' in response:
                 request = compute_service.instances().aggregatedList(
-                    project=project_id, pageToken=response['nextPageToken'])
+                    project=project_id, filter='status = RUNNING', maxResults=500,
+                    fields='items/*/instances(id),nextPageToken', pageToken=response['nextPageToken'])
             else:
                 break
         return instances_count
@@ -73,19 +221,19 @@ def count_running_compute_instances(service, project_id, credentials):
         return 0
 
 # Function to count Cloud Functions in a project
-def count_cloud_functions(service, project_id, credentials):
+def count_cloud_functions(project_id, credentials):
     try:
-        functions_service = build('cloudfunctions', 'v1', credentials=credentials)
+        functions_service = get_service('cloudfunctions', 'v1', credentials)
         # List Cloud Functions in all regions, paginating through results
         functions_count = 0
         request = functions_service.projects().locations().functions().list(
-            parent=f"projects/{project_id}/locations/-")
+            parent=f"projects/{project_id}/locations/-", pageSize=1000, fields='functions(name),nextPageToken')
         while request is not None:
-            response = request.execute()
+            response = request.execute(num_retries=NUM_RETRIES)
             functions_count += len(response.get('functions', []))
             if 'nextPageToken' in response:
                 request = functions_service.projects().locations().functions().list(
-                    parent=f"projects/{project_id}/locations/-",
+                    parent=f"projects/{project_id}/locations/-", pageSize=1000, fields='functions(name),nextPageToken',
                     pageToken=response['nextPageToken'])
             else:
                 break
@@ -96,12 +244,12 @@ def count_cloud_functions(service, project_id, credentials):
         return 0
 
 # Function to count GKE clusters in a project
-def count_gke_clusters(service, project_id, credentials):
+def count_gke_clusters(project_id, credentials):
     try:
-        container_service = build('container', 'v1', credentials=credentials)
+        container_service = get_service('container', 'v1', credentials)
         # List GKE clusters in the project
         clusters_list = container_service.projects().locations().clusters().list(
-            parent=f"projects/{project_id}/locations/-").execute()
+            parent=f"projects/{project_id}/locations/-", fields='clusters(name)').execute(num_retries=NUM_RETRIES)
         clusters_count = 0
         if 'clusters' in clusters_list:
             clusters_count = len(clusters_list['clusters'])
@@ -110,105 +258,162 @@ def count_gke_clusters(service, project_id, credentials):
         error_message = f"An error occurred while counting GKE clusters in project {project_id}: {str(e)}"
         logging.error(error_message)
         return 0
+# Function to list the names of the Artifact Registry repositories in one location
+def list_artifact_repositories(location_name, credentials):
+    repositories_api = get_service('artifactregistry', 'v1', credentials).projects().locations().repositories()
+    repository_names = []
+    request = repositories_api.list(parent=location_name, pageSize=1000, fields='repositories(name),nextPageToken')
+    while request is not None:
+        repositories_list = request.execute(num_retries=NUM_RETRIES)
+        repository_names += [repository['name'] for repository in repositories_list.get('repositories', [])]
+        request = repositories_api.list_next(previous_request=request, previous_response=repositories_list)
+    return repository_names
+
+# Function to count the Docker images in one Artifact Registry repository
+def count_docker_images(repository_name, credentials):
+    images_api = get_service('artifactregistry', 'v1', credentials).projects().locations().repositories().dockerImages()
+    docker_image_count = 0
+    request = images_api.list(parent=repository_name, pageSize=1000, fields='dockerImages(name),nextPageToken')
+    while request is not None:
+        docker_images_list = request.execute(num_retries=NUM_RETRIES)
+        docker_image_count += len(docker_images_list.get('dockerImages', []))
+        request = images_api.list_next(previous_request=request, previous_response=docker_images_list)
+    return docker_image_count
+
 # Function to count Artifacts Repositories and Docker Images in a project
-def count_artifacts_and_docker_images(service, project_id):
+def count_artifacts_and_docker_images(project_id, credentials):
     try:
         # Build the Artifact Registry client
-        artifact_registry_service = build('artifactregistry', 'v1', credentials=credentials)
+        artifact_registry_service = get_service('artifactregistry', 'v1', credentials)
 
         # Fetch available locations for the project
         locations_response = artifact_registry_service.projects().locations().list(
-            name=f'projects/{project_id}'
-        ).execute()
+            name=f'projects/{project_id}', fields='locations(name)'
+        ).execute(num_retries=NUM_RETRIES)
 
         # Get the list of available locations
         locations = locations_response.get('locations', [])
 
-        # Initialize counts
-        total_repository_count = 0
-        total_docker_image_count = 0
+        # List repositories in every location at the same time
+        repository_names = []
+        for location_repository_names in artifact_executor.map(
+                lambda location: list_artifact_repositories(location['name'], credentials), locations):
+            repository_names += location_repository_names
+
+        # Count Docker images in every repository at the same time
+        total_docker_image_count = sum(artifact_executor.map(
+            lambda repository_name: count_docker_images(repository_name, credentials), repository_names))
 
-        # Iterate through locations and count repositories and Docker Images
-        for location in locations:
-            # List repositories in each location
-            repositories_list = artifact_registry_service.projects().locations().repositories().list(
-                parent=f'projects/{project_id}/locations/{location["locationId"]}'
-            ).execute()
+        return len(repository_names), total_docker_image_count
+
+    except HttpError as e:
+        error_message = f"An error occurred while counting Artifacts Repositories and Docker Images in project {project_id}: {str(e)}"
+        logging.error(error_message)
+        return 0, 0
 
-            # Get the count of repositories in each location
-            repository_count = len(repositories_list.get('repositories', []))
+# Function to count every resource type in a project, calling the independent service APIs at the same time
+def count_project_resources(project_id, credentials):
+    instances_future = counter_executor.submit(count_running_compute_instances, project_id, credentials)
+    functions_future = counter_executor.submit(count_cloud_functions, project_id, credentials)
+    gke_clusters_future = counter_executor.submit(count_gke_clusters, project_id, credentials)
+    artifacts_future = counter_executor.submit(count_artifacts_and_docker_images, project_id, credentials)
 
-            # List Docker images in each repository
-            for repository in repositories_list.get('repositories', []):
-                repository_name = repository['name']
-                docker_images_list = artifact_registry_service.projects().locations().repositories().dockerImages().list(
-                    parent=f'{repository_name}'
-                ).execute()
+    repository_count, docker_image_count = artifacts_future.result()
+    return (instances_future.result(), functions_future.result(), gke_clusters_future.result(), repository_count,
+            docker_image_count)
 
-                # Get the count of Docker images in each repository
-                docker_image_count = len(docker_images_list.get('dockerImages', []))
+# Function to log the resource counts of a project and queue them for the CSV file
+def save_project_counts(project_id, instances_count, functions_count, gke_clusters_count, repository_count,
+                        docker_image_count, csv_queue):
+    # Print the total counts for project
+    logging.info(f"  Project ID {project_id} Resource Counts:")
+    logging.info(f"  Running Compute Instances: {instances_count}")
+    logging.info(f"  Cloud Functions: {functions_count}")
+    logging.info(f"  GKE Clusters: {gke_clusters_count}")
+    logging.info(f"  Docker Images: {docker_image_count}")
 
-                total_repository_count += 1
-                total_docker_image_count += docker_image_count
+    # Queue the project data for the CSV writer thread
+    csv_queue.put([project_id, instances_count, functions_count, gke_clusters_count, repository_count,
+                   docker_image_count])
 
-        return total_repository_count, total_docker_image_count
+# Start a thread that writes rows from a queue to the CSV file until it receives None
+def start_csv_writer(csv_file):
+    csv_queue = queue.Queue()
 
-    except HttpError as e:
-        error_message = f"An error occurred while counting Artifacts Repositories and Docker Images in project {project_id}: {str(e)}"
+    def write_rows():
+        csv_writer = csv.writer(csv_file)
+        while True:
+            # Wait for a row, then take every other row already queued and write them together
+            rows = [csv_queue.get()]
+            while rows[-1] is not None and not csv_queue.empty():
+                rows.append(csv_queue.get_nowait())
+            stop = rows[-1] is None
+            if stop:
+                rows.pop()
+            csv_writer.writerows(rows)
+            csv_file.flush()
+            if stop:
+                break
+
+    writer_thread = threading.Thread(target=write_rows, daemon=True)
+    writer_thread.start()
+    return csv_queue, writer_thread
+
+# Open a CSV file for appending, writing the header row if it is new, and yield the queue its writer thread drains
+@contextlib.contextmanager
+def open_csv_queue(csv_file_path):
+    csv_exists = os.path.isfile(csv_file_path)
+    with open(csv_file_path, 'a', newline='') as csv_file:
+        csv_queue, writer_thread = start_csv_writer(csv_file)
+        try:
+            if not csv_exists:
+                csv_queue.put(CSV_HEADER)
+            yield csv_queue
+        finally:
+            # Stop the writer thread once every queued row is written
+            csv_queue.put(None)
+            writer_thread.join()
+
+    # Display the path to the CSV file
+    info_message = f'CSV file updated at: {csv_file_path}'
+    logging.info(info_message)
+
+# Function to count resources of every project in an organization with one Cloud Asset Inventory search,
+# keyed by project resource name (projects/<number>), or None if the search is not available
+def count_resources_with_asset_inventory(credentials, organization_id):
+    counts = defaultdict(Counter)
+    try:
+        asset_service = get_service('cloudasset', 'v1', credentials)
+        request = asset_service.v1().searchAllResources(
+            scope=f"organizations/{organization_id}", assetTypes=ASSET_TYPES, pageSize=500,
+            fields='nextPageToken,results(assetType,project,state)')
+        while request is not None:
+            response = request.execute(num_retries=NUM_RETRIES)
+            for resource in response.get('results', []):
+                # Only running compute instances are counted, matching the per-project counter
+                if resource['assetType'] == 'compute.googleapis.com/Instance' and resource.get('state') != 'RUNNING':
+                    continue
+                counts[resource['project']][resource['assetType']] += 1
+            request = asset_service.v1().searchAllResources_next(previous_request=request, previous_response=response)
+        return counts
+    except Exception as e:
+        error_message = f"An error occurred while searching Cloud Asset Inventory in organization {organization_id}, " \
+                        f"counting each project instead: {str(e)}"
         logging.error(error_message)
-        return 0, 0
+        return None
 
 # Function to process resources for a single project
-def process_resources(credentials, project_id):
+def process_resources(credentials, project_id, csv_queue):
     try:
-        # Create the Resource Manager API client
-        service = build('cloudresourcemanager', 'v3', credentials=credentials)
-
         info_message = f'Fetching Resources for Project ID: {project_id}'
         logging.info(info_message)
 
         # Count resources for the single project
-        instances_count = count_running_compute_instances(service, project_id, credentials)
-        functions_count = count_cloud_functions(service, project_id, credentials)
-        gke_clusters_count = count_gke_clusters(service, project_id, credentials)
-        repository_count, docker_image_count = count_artifacts_and_docker_images(service, project_id)
-
-        result_message = f'Project: {project_id}, ' \
-                         f'Running Compute Instances: {instances_count}, ' \
-                         f'Cloud Functions: {functions_count}, ' \
-                         f'GKE Clusters: {gke_clusters_count}, ' \
-                         f'Artifacts Repositories: {repository_count}, ' \
-                         f'Docker Images: {docker_image_count}'
-
-        # Print the total counts for project
-        logging.info(f"  Project ID {project_id} Resource Counts:")
-        logging.info(f"  Running Compute Instances: {instances_count}")
-        logging.info(f"  Cloud Functions: {functions_count}")
-        logging.info(f"  GKE Clusters: {gke_clusters_count}")
-        logging.info(f"  Docker Images: {docker_image_count}")
-
-        # Create a CSV file to store the results
-        csv_file = 'gcp_resource_counts.csv'
-        script_directory = os.path.dirname(os.path.realpath(__file__))
-        csv_file_path = os.path.join(script_directory, csv_file)
-        # Check if the CSV file already exists, if not, write the header row
-        if not os.path.isfile(csv_file_path):
-            with open(csv_file_path, 'w', newline='') as csv_file:
-                csv_writer = csv.writer(csv_file)
-                # Write the header row
-                csv_writer.writerow(
-                    ['Project ID', 'Running Compute Instances', 'Cloud Functions', 'GKE Clusters', 'Artifacts Repositories',
-                     'Docker Images'])
-
-        # Append the project data to the CSV file
-        with open(csv_file_path, 'a', newline='') as csv_file:
-            csv_writer = csv.writer(csv_file)
-            # Write the project data
-            csv_writer.writerow([project_id, instances_count, functions_count, gke_clusters_count, repository_count,
-                                 docker_image_count])
-        # Display the path to the CSV file
-        info_message = f'CSV file updated at: {csv_file_path}'
-        logging.info(info_message)
+        instances_count, functions_count, gke_clusters_count, repository_count, docker_image_count = \
+            count_project_resources(project_id, credentials)
+
+        save_project_counts(project_id, instances_count, functions_count, gke_clusters_count, repository_count,
+                            docker_image_count, csv_queue)
 
     except Exception as e:
         error_message = f"An error occurred while processing project {project_id}: {str(e)}"
@@ -217,59 +422,57 @@ def process_resources(credentials, project_id):
 # Function to run the code for an organization using multithreading
 def run_for_organization(organization_id, service_account_key_file, credentials):
     # Create the Resource Manager API client
-    service = build('cloudresourcemanager', 'v3', credentials=credentials)
+    service = get_service('cloudresourcemanager', 'v3', credentials)
 
-    # List projects directly under the organization
-    org_projects = list_projects_under_organization(service, organization_id)
+    # Map each project's resource name (projects/<number>) to its project ID with one search over the organization
+    project_ids = search_projects_in_organization(service, organization_id)
+    if project_ids is None:
+        # List all folders under the organization
+        folder_ids = list_child_folder_ids(service, f"organizations/{organization_id}")
 
-    # List all folders under the organization
-    folders = service.folders().list(parent=f"organizations/{organization_id}").execute().get('folders', [])
+        # Walk projects directly under the organization and under every folder and its child folders instead
+        project_ids = dict(itertools.chain(list_projects_under_organization(service, organization_id),
+                                           list_projects_in_folders(credentials, folder_ids)))
 
-    # Create a list to store all project IDs
-    all_project_ids = []
-
-    # Add projects directly under the organization to the list
-    for project in org_projects:
-        all_project_ids.append(project['projectId'])
-
-    # Iterate through the folders and list projects under each folder and its child folders
-    for folder in folders:
-        folder_id = folder['name'].split('/')[-1]  # Extract the folder ID from the folder name
-        projects = list_projects_recursive(service, folder_id)
-        for project in projects:
-            all_project_ids.append(project['projectId'])
-
-    # Convert the list to a set to ensure uniqueness and count the unique projects
-    unique_project_ids = set(all_project_ids)
+    # Convert the project IDs to a set to ensure uniqueness and count the unique projects
+    unique_project_ids = set(project_ids.values())
 
     # Display the unique project count
     info_message = f'Unique Project Count under Organization {organization_id}: {len(unique_project_ids)}'
     logging.info(info_message)
 
-    # Create a thread pool to process resources concurrently for each project
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:  # Adjust max_workers as needed
-        # Submit tasks for processing resources for each project
-        futures = {executor.submit(process_resources, credentials, project_id): project_id for project_id in unique_project_ids}
-
-        # Wait for all tasks to complete
-        for future in concurrent.futures.as_completed(futures):
-            project_id = futures[future]
-            try:
-                future.result()  # Get the result of the completed task
-            except Exception as e:
-                error_message = f"An error occurred while processing project {project_id}: {str(e)}"
-                logging.error(error_message)
+    # Open the CSV file once for the whole organization
+    with open_csv_queue(ORGANIZATION_CSV_PATH) as csv_queue:
+        # Count every project's resources with one organization-wide Cloud Asset Inventory search
+        asset_counts = count_resources_with_asset_inventory(credentials, organization_id)
+        if asset_counts is not None:
+            for project_name, project_id in project_ids.items():
+                counts = asset_counts.get(project_name, Counter())
+                save_project_counts(project_id, *[counts[asset_type] for asset_type in ASSET_TYPES], csv_queue)
+        else:
+            # Create a thread pool to process resources concurrently for each project
+            with concurrent.futures.ThreadPoolExecutor(max_workers=GCP_CONCURRENCY) as executor:
+                # Submit tasks for processing resources for each project
+                futures = {executor.submit(process_resources, credentials, project_id, csv_queue): project_id
+                           for project_id in unique_project_ids}
+
+                # Wait for all tasks to complete, advancing the progress bar as each project finishes
+                for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures),
+                                   desc="Processing Projects", unit="project"):
+                    project_id = futures[future]
+                    try:
+                        future.result()  # Get the result of the completed task
+                    except Exception as e:
+                        error_message = f"An error occurred while processing project {project_id}: {str(e)}"
+                        logging.error(error_message)
 
     # Save the log file in the same directory as the script
-    log_file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), log_file)
+    log_file_path = os.path.join(SCRIPT_DIR, log_file)
     info_message = f'Log file saved at: {log_file_path}'
     logging.info(info_message)
 
 # Function to run the code for a single project using provided credentials
 def run_for_project(credentials):
-    # Create the Resource Manager API client
-    service = build('cloudresourcemanager', 'v3', credentials=credentials)
-
     # Fetch the project ID automatically from the provided credentials
     project_id = credentials.project_id
 
@@ -277,47 +480,13 @@ def run_for_project(credentials):
     logging.info(info_message)
 
     # Count resources for the single project
-    instances_count = count_running_compute_instances(service, project_id, credentials)
-    functions_count = count_cloud_functions(service, project_id, credentials)
-    gke_clusters_count = count_gke_clusters(service, project_id, credentials)
-    repository_count, docker_image_count = count_artifacts_and_docker_images(service, project_id)
-
-    result_message = f'Project: {project_id}, ' \
-                     f'Running Compute Instances: {instances_count}, ' \
-                     f'Cloud Functions: {functions_count}, ' \
-                     f'GKE Clusters: {gke_clusters_count}, ' \
-                     f'Artifacts Repositories: {repository_count}, ' \
-                     f'Docker Images: {docker_image_count}'
-
-    # Print the total counts for project
-    logging.info(f"  Project ID {project_id} Resource Counts:")
-    logging.info(f"  Running Compute Instances: {instances_count}")
-    logging.info(f"  Cloud Functions: {functions_count}")
-    logging.info(f"  GKE Clusters: {gke_clusters_count}")
-    logging.info(f"  Docker Images: {docker_image_count}")
+    instances_count, functions_count, gke_clusters_count, repository_count, docker_image_count = \
+        count_project_resources(project_id, credentials)
 
-    # Create a CSV file to store the results
-    csv_file = 'project_resource_counts.csv'
-    script_directory = os.path.dirname(os.path.realpath(__file__))
-    csv_file_path = os.path.join(script_directory, csv_file)
-    # Check if the CSV file already exists, if not, write the header row
-    if not os.path.isfile(csv_file_path):
-        with open(csv_file_path, 'w', newline='') as csv_file:
-            csv_writer = csv.writer(csv_file)
-            # Write the header row
-            csv_writer.writerow(
-                ['Project ID', 'Running Compute Instances', 'Cloud Functions', 'GKE Clusters', 'Artifacts Repositories',
-                 'Docker Images'])
-
-    # Append the project data to the CSV file
-    with open(csv_file_path, 'a', newline='') as csv_file:
-        csv_writer = csv.writer(csv_file)
-        # Write the project data
-        csv_writer.writerow([project_id, instances_count, functions_count, gke_clusters_count, repository_count,
-                             docker_image_count])
-    # Display the path to the CSV file
-    info_message = f'CSV file updated at: {csv_file_path}'
-    logging.info(info_message)
+    # Log the counts and append them to the project CSV file
+    with open_csv_queue(PROJECT_CSV_PATH) as csv_queue:
+        save_project_counts(project_id, instances_count, functions_count, gke_clusters_count, repository_count,
+                            docker_image_count, csv_queue)
 
 if __name__ == "__main__":
     print("Choose an option:")
@@ -328,14 +497,12 @@ if __name__ == "__main__":
         # Run for an entire organization
         organization_id = input("Enter your organization ID: ")
         service_account_key_file = input("Enter the path to your service account key JSON file: ")
-        credentials = service_account.Credentials.from_service_account_file(
-            service_account_key_file, scopes=['https://www.googleapis.com/auth/cloud-platform'])
+        credentials = load_credentials(service_account_key_file)
         run_for_organization(organization_id, service_account_key_file, credentials)
     elif option == "2":
         # Run for a single project using the provided credentials
         credentials_path = input("Enter the path to your service account key JSON file: ")
-        credentials = service_account.Credentials.from_service_account_file(
-            credentials_path, scopes=['https://www.googleapis.com/auth/cloud-platform'])
+        credentials = load_credentials(credentials_path)
         run_for_project(credentials)
     else:
         print("Invalid option. Please choose 1 or 2.")